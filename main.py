@@ -1,6 +1,7 @@
 from os.path import dirname, abspath
 from datetime import timedelta
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, __version__ as fastapi_version
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -14,6 +15,13 @@ from schemas.auth import Token
 from utilities.docker_scripts import DockerUtils
 from utilities.app_metadata import tags_metadata, app_metadata_description
 from utilities.auth_scripts import AuthUtils
+from utilities.file_scripts import FileUtils
+
+# FastAPI serializes response models to JSON bytes with pydantic-core since 0.130,
+# older versions get the faster orjson responses
+default_response_class = (
+    JSONResponse if tuple(map(int, fastapi_version.split('.')[:2])) >= (0, 130) else ORJSONResponse
+)
 
 # FastAPI app instance
 app = FastAPI(title='Autograding-API',
@@ -27,7 +35,8 @@ app = FastAPI(title='Autograding-API',
               license_info={
                   "name": "Apache 2.0",
                   "url": "https://www.apache.org/licenses/LICENSE-2.0.html",
-              }, openapi_tags=tags_metadata)
+              }, openapi_tags=tags_metadata,
+              default_response_class=default_response_class)
 
 # Save main app directory
 APP_ROOT = dirname(abspath(__file__))
@@ -47,11 +56,13 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 @app.on_event("startup")
 async def startup():
     await database.connect()
+    FileUtils.start_topic_index_persister()
 
 
 @app.on_event("shutdown")
 async def shutdown():
     await database.disconnect()
+    await FileUtils.stop_topic_index_persister()
 
 
 @app.post("/auth/token", response_model=Token, summary="Grab the Bearer token")
@@ -39,4 +39,4 @@ async def create_user(user: UserCreate):
         email=user.email, hashed_password=fake_hashed, is_root=user.is_root, is_active=True
     )
     last_record_id = await database.execute(query)
-    return {**user.dict(), "id": last_record_id}
+    return {**user.model_dump(), "id": last_record_id}
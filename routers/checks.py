@@ -1,3 +1,4 @@
+from os import environ
 from fastapi import File, UploadFile, APIRouter, HTTPException, Depends, BackgroundTasks
 from fastapi.responses import JSONResponse, Response
 from fastapi.requests import Request
@@ -16,7 +17,9 @@ router_checks = APIRouter(
     tags=["checks"],
 )
 
-limiter = Limiter(key_func=get_remote_address)
+# Use a shared storage like "redis://localhost:6379" to count limits across app instances
+RATE_LIMIT_STORAGE_URI = environ.get("RATE_LIMIT_STORAGE_URI", "memory://")
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE_URI)
 
 
 @router_checks.post(
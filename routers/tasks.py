@@ -1,11 +1,13 @@
+from asyncio import gather
 from fastapi import status, File, UploadFile, APIRouter, HTTPException, Depends, BackgroundTasks
 from fastapi.responses import JSONResponse, Response
 from fastapi.encoders import jsonable_encoder
 from schemas.tasks import Task, TaskUpdate, TaskCreate
-from schemas.errors import NotFoundTopic, NotFoundTask, EmptyRequest
+from schemas.errors import NotFoundTopic, NotFoundTask, EmptyRequest, ServerOverloaded
 from schemas.auth import User
 from utilities.file_scripts import FileUtils
 from utilities.auth_scripts import get_current_active_user
+from utilities.admission_scripts import AdmissionController
 
 router_tasks = APIRouter(
     redirect_slashes=False,
@@ -13,6 +15,14 @@ router_tasks = APIRouter(
     tags=["tasks"],
 )
 
+# Adaptive concurrency limit for the file upload endpoints
+admission = AdmissionController()
+
+
+async def _no_read(result=None):
+    """Stands in for a skipped read in `gather`, returning `result` right away."""
+    return result
+
 
 @router_tasks.get(
     "/{topic_id}/{task_id}", status_code=200, summary="Read task by ID",
@@ -21,67 +31,68 @@ router_tasks = APIRouter(
 async def read_task(topic_id: int, task_id: int) -> Task or JSONResponse:
     """The `read task` CRUD endpoint."""
     try:
-        # Get task info, inputs and outputs.
-        description = await FileUtils.open_file('task_info', topic_id, task_id)
-        inputs = await FileUtils.open_file_values('task_input', topic_id, task_id)
-        outputs = await FileUtils.open_file_values('task_output', topic_id, task_id)
+        # Get task info, inputs and outputs concurrently.
+        description, inputs, outputs = await gather(
+            FileUtils.open_file('task_info', topic_id, task_id),
+            FileUtils.open_file_values('task_input', topic_id, task_id),
+            FileUtils.open_file_values('task_output', topic_id, task_id),
+        )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=NotFoundTask().error)
     except IndexError:
         raise HTTPException(status_code=404, detail=NotFoundTopic().error)
     else:
-        return Task(**description, input=list(inputs), output=list(outputs))
+        # The stored task was validated on creation, so validation is skipped
+        return Task.model_construct(**description, input=inputs, output=outputs)
 
 
 @router_tasks.post(
     "/{topic_id}", status_code=201, summary="Create new task",
-    response_model=Task, responses={404: {"model": NotFoundTopic}}
+    response_model=Task, responses={404: {"model": NotFoundTopic}, 503: {"model": ServerOverloaded}}
 )
 async def create_task(
-        topic_id: int, task: TaskCreate or UploadFile, background_tasks: BackgroundTasks,
+        topic_id: int, task: TaskCreate or UploadFile,
         code: UploadFile = File(...), current_user: User = Depends(get_current_active_user)
 ) -> Task or JSONResponse:
     """The `create task` CRUD endpoint."""
-    # If this is a test mode, the actual data will be protected from changes.
-    try:
-        topics_json = await FileUtils.open_file('topic_index', topic_id=topic_id)
-    except IndexError:
-        raise HTTPException(status_code=404, detail=NotFoundTopic().error)
     if isinstance(task, UploadFile):
         task = TaskCreate(**jsonable_encoder(task))
-    # Get ID
-    task_id = topics_json[topic_id].get("count") + 1
-    # Create new task
-    task = Task(
-        id=task_id, topic_id=topic_id, **task.dict()
-    )
-    # New task's info dictionary
-    task_description = {key: value for key, value in task
-                        if key in ("id", "topic_id", "title", "description")}
-    saving_config = {
-        "topic_id": topic_id, "task_id": task.id
-    }
-    # Save task info
-    background_tasks.add_task(FileUtils.save_file, 'task_info', content=task_description, **saving_config)
-    # Save task's input values
-    background_tasks.add_task(FileUtils.save_file_values, "task_input", content=task.input, **saving_config)
-    # Save task code's output values
-    background_tasks.add_task(FileUtils.save_file_values, "task_output", content=task.output, **saving_config)
-    # Save task's code
-    background_tasks.add_task(FileUtils.save_file, "task_code", content=await code.read(), **saving_config)
-    # Update the topic tasks count
-    topics_json[topic_id]["count"] = task_id
-    background_tasks.add_task(FileUtils.save_file, 'topic_index', content=topics_json)
+    async with admission.slot():
+        try:
+            # Get ID, the topic tasks count is bumped once all task files are saved
+            async with FileUtils.reserve_task_id(topic_id) as task_id:
+                # Create new task from the already validated fields
+                task = Task.model_construct(
+                    id=task_id, topic_id=topic_id, **dict(task)
+                )
+                # New task's info dictionary
+                task_description = {
+                    "id": task.id, "topic_id": task.topic_id,
+                    "title": task.title, "description": task.description
+                }
+                saving_config = {
+                    "topic_id": topic_id, "task_id": task.id
+                }
+                # Save task info, input values, output values and code concurrently,
+                # the code is streamed chunk by chunk
+                await gather(
+                    FileUtils.save_file('task_info', content=task_description, **saving_config),
+                    FileUtils.save_file_values("task_input", content=task.input, **saving_config),
+                    FileUtils.save_file_values("task_output", content=task.output, **saving_config),
+                    FileUtils.save_file("task_code", content=FileUtils.iter_upload(code), **saving_config),
+                )
+        except IndexError:
+            raise HTTPException(status_code=404, detail=NotFoundTopic().error)
     return task
 
 
 @router_tasks.patch(
     "/{topic_id}/{task_id}", status_code=200, summary="Update task by ID",
     response_model=TaskUpdate, response_model_exclude_none=True,
-    responses={404: {"model": NotFoundTask}}
+    responses={404: {"model": NotFoundTask}, 503: {"model": ServerOverloaded}}
 )
 async def update_task(
-        topic_id: int, task_id: int, task: TaskUpdate, background: BackgroundTasks,
+        topic_id: int, task_id: int, task: TaskUpdate,
         code: UploadFile = File(None), current_user: User = Depends(get_current_active_user)
 ) -> Task or JSONResponse:
     """The `update task` CRUD endpoint.\n
@@ -89,50 +100,61 @@ async def update_task(
     one at a time, or all at once.\n
     Please uncheck "Send empty value" in Swagger UI!
     """
-    if not any(task.dict().values()):
+    # Detect an empty request without reading the code file
+    update_fields = any(dict(task).values())
+    update_code = code is not None and bool(code.filename)
+    if not (update_fields or update_code):
         raise HTTPException(status_code=422, detail=EmptyRequest().error)
 
     saving_config = {"topic_id": topic_id, "task_id": task_id}
-    code = await code.read()
-    task = TaskUpdate(**jsonable_encoder(task))
-    task.id = task_id
-    task.topic_id = topic_id
-
-    # Update task's description
-    if any([task.title, task.description]):
-        try:
-            # Get task info
-            task_info = await FileUtils.open_file("task_info", **saving_config)
-        except FileNotFoundError:
+    async with admission.slot():
+        task.id = task_id
+        task.topic_id = topic_id
+        update_info = any([task.title, task.description])
+        # Peek the first chunk to detect whether the code file was uploaded,
+        # and get task info if it changes or to check the task exists before
+        # the code is streamed, both at the same time
+        first_chunk, task_info = await gather(
+            code.read(FileUtils.CHUNK_SIZE) if update_code else _no_read(b''),
+            FileUtils.open_file("task_info", **saving_config)
+            if update_info or update_code else _no_read(),
+            return_exceptions=True,
+        )
+        if isinstance(first_chunk, Exception):
+            raise first_chunk
+        if not (update_fields or first_chunk):
+            raise HTTPException(status_code=422, detail=EmptyRequest().error)
+        if isinstance(task_info, FileNotFoundError):
             raise HTTPException(status_code=404, detail=NotFoundTask().error)
-        except IndexError:
+        if isinstance(task_info, IndexError):
             raise HTTPException(status_code=404, detail=NotFoundTopic().error)
-        else:
-            # Update task's description
-            task_info["title"] = task.title if task.title else task_info["title"]
-            task_info["description"] = task.description if task.description else task_info["description"]
-            background.add_task(FileUtils.save_file, "task_info", content=task_info, **saving_config)
-    # Update task's input values
-    if task.input:
-        try:
-            background.add_task(FileUtils.save_file_values, "task_input", content=task.input, **saving_config)
-        except FileNotFoundError:
-            raise HTTPException(status_code=404, detail=NotFoundTask().error)
-    # Update task answer's output values
-    if task.output:
-        try:
-            background.add_task(FileUtils.save_file_values, "task_output", content=task.output, **saving_config)
-        except FileNotFoundError:
-            raise HTTPException(status_code=404, detail=NotFoundTask().error)
-    # Update task's code file
-    if code:
+        if isinstance(task_info, Exception):
+            raise task_info
+
+        # Save the changed task info, input values, output values and code concurrently,
+        # the code is streamed chunk by chunk
+        writes = []
+        if update_info:
+            task_info.update(
+                (key, value) for key, value in (("title", task.title), ("description", task.description))
+                if value
+            )
+            writes.append(FileUtils.save_file("task_info", content=task_info, **saving_config))
+        if task.input:
+            writes.append(FileUtils.save_file_values("task_input", content=task.input, **saving_config))
+        if task.output:
+            writes.append(FileUtils.save_file_values("task_output", content=task.output, **saving_config))
+        if first_chunk:
+            writes.append(FileUtils.save_file(
+                "task_code", content=FileUtils.iter_upload(code, first_chunk), **saving_config
+            ))
         try:
-            background.add_task(FileUtils.save_file, "task_code", content=code, **saving_config)
+            await gather(*writes)
         except IndexError:
             raise HTTPException(status_code=404, detail=NotFoundTopic().error)
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail=NotFoundTask().error)
-    return Task(task_id=task.id, **task.dict())
+    return task
 
 
 @router_tasks.delete(
@@ -144,17 +166,12 @@ async def delete_task(
         current_user: User = Depends(get_current_active_user)
 ) -> Response or JSONResponse:
     """The `delete task` CRUD endpoint."""
-    files = ("task_info", "task_input", "task_output", "task_code")
-    for title in files:
-        try:
-            await FileUtils.remove_file(title, topic_id=topic_id, task_id=task_id)
-        except IndexError:
-            raise HTTPException(status_code=404, detail=NotFoundTopic().error)
-        except FileNotFoundError:
-            raise HTTPException(status_code=404, detail=NotFoundTask().error)
-    # Open topic info
-    topics = await FileUtils.open_file('topic_index')
+    try:
+        await FileUtils.remove_task_files(topic_id=topic_id, task_id=task_id)
+    except IndexError:
+        raise HTTPException(status_code=404, detail=NotFoundTopic().error)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=NotFoundTask().error)
     # Update the topic tasks count
-    topics[topic_id]["count"] -= 1
-    background.add_task(FileUtils.save_file, "topic_index", content=topics, topic_id=topic_id, task_id=task_id)
+    background.add_task(FileUtils.update_topic_count, topic_id, -1)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
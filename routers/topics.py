@@ -36,5 +36,5 @@ async def read_topic(topic_id: int) -> Topic or JSONResponse:
         description = await FileUtils.open_file('task_info', topic_id, task_id)
         inputs = await FileUtils.open_file_values('task_input', topic_id, task_id)
         outputs = await FileUtils.open_file_values('task_output', topic_id, task_id)
-        topic.tasks.append(Task(**description, input=list(inputs), output=list(outputs)))
+        topic.tasks.append(Task(**description, input=inputs, output=outputs))
     return topic
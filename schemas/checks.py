@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class CheckResult(BaseModel):
@@ -10,11 +10,12 @@ class CheckResult(BaseModel):
     your_result: str
     status: str
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "answer": "Expected code output.",
                 "your_result": "Actual code output.",
                 "status": "OK or WRONG",
             }
         }
+    )
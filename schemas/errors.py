@@ -20,6 +20,10 @@ class DockerUnavailable(BaseModel):
     error: str = "Docker problems, please try again later."
 
 
+class ServerOverloaded(BaseModel):
+    error: str = "Server is overloaded, please try again later."
+
+
 class EmptyRequest(BaseModel):
     error: str = "The request was empty"
 
@@ -1,5 +1,5 @@
 from json import loads
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, model_validator
 from typing import Optional, List
 
 
@@ -15,8 +15,8 @@ class Task(BaseModel):
     input: List[str]
     output: List[str]
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "id": 0,
                 "topic_id": 0,
@@ -27,6 +27,7 @@ class Task(BaseModel):
                 "output": ["First output", "2"],
             }
         }
+    )
 
 
 class TaskCreate(BaseModel):
@@ -39,18 +40,15 @@ class TaskCreate(BaseModel):
     input: List[str]
     output: List[str]
 
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate_to_json
-
+    @model_validator(mode='before')
     @classmethod
     def validate_to_json(cls, value):
         if isinstance(value, str):
-            return cls(**loads(value))
+            return loads(value)
         return value
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "title": "string",
                 "description": ["Task's essence.",
@@ -59,6 +57,7 @@ class TaskCreate(BaseModel):
                 "output": ["First output", "2"],
             }
         }
+    )
 
 
 class TaskUpdate(BaseModel):
@@ -71,19 +70,16 @@ class TaskUpdate(BaseModel):
     input: Optional[List[str]] = None
     output: Optional[List[str]] = None
 
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate_to_json
-
+    @model_validator(mode='before')
     @classmethod
     def validate_to_json(cls, value):
         if isinstance(value, str):
-            return cls(**loads(value))
+            return loads(value)
         return value
 
-    class Config:
-        extra = 'allow'
-        schema_extra = {
+    model_config = ConfigDict(
+        extra='allow',
+        json_schema_extra={
             "example": {
                 "title": "string",
                 "description": ["If you want to change only the code",
@@ -92,3 +88,4 @@ class TaskUpdate(BaseModel):
                 "output": ["First output", "2"],
             }
         }
+    )
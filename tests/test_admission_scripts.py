@@ -0,0 +1,67 @@
+from pytest import mark, raises
+from fastapi import HTTPException
+from utilities.admission_scripts import AdmissionController
+
+
+class TestAdmissionController:
+    def test_limit_increase(self):
+        admission = AdmissionController(max_limit=8.0)
+
+        admission.on_success(0.01)
+
+        assert admission.limit == 4.5
+
+    def test_limit_decrease_once_per_window(self):
+        admission = AdmissionController(max_limit=64.0, window=10)
+
+        admission.on_success(2.0)
+        limit = admission.limit
+        for _ in range(5):
+            admission.on_success(0.01)
+
+        assert limit == 16.0
+        assert admission.limit == 16.0
+
+    def test_limit_error_decrease(self):
+        admission = AdmissionController(max_limit=64.0, window=1)
+
+        admission.on_error()
+        admission.on_success(0.01)
+        admission.on_error()
+
+        assert admission.limit == (32.0 * 0.5 + 0.5) * 0.5
+
+    def test_limit_floor_and_ceiling(self):
+        admission = AdmissionController(min_limit=1.0, max_limit=4.0, window=0)
+
+        for _ in range(10):
+            admission.on_error()
+        floor = admission.limit
+        for _ in range(10):
+            admission.on_success(0.0)
+
+        assert floor == 1.0
+        assert admission.limit == 4.0
+
+    @mark.asyncio
+    async def test_slot_shedding(self):
+        admission = AdmissionController(max_limit=2.0)
+
+        async with admission.slot():
+            with raises(HTTPException) as e:
+                async with admission.slot():
+                    pass
+
+        assert e.value.status_code == 503
+        assert admission.in_flight == 0
+
+    @mark.asyncio
+    async def test_slot_server_error(self):
+        admission = AdmissionController(max_limit=64.0)
+
+        with raises(HTTPException):
+            async with admission.slot():
+                raise HTTPException(status_code=500)
+
+        assert admission.limit == 16.0
+        assert admission.in_flight == 0
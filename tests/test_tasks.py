@@ -1,4 +1,4 @@
-from os.path import abspath, dirname, join
+from os.path import abspath, dirname, exists, join
 from .mixins import TestAuthMixin
 
 
@@ -49,6 +49,24 @@ class TestTasksCRUDSync(TestAuthMixin):
         assert not content.get("input")
         assert not content.get("output")
 
+    def test_task_update_code_only(self):
+        code = b'print("CODE")\n'
+        files = {"task": (None, b'{"title": "", "description": [], '
+                                b'"input": [], "output": []}'),
+                 "code": ("code.py", code)}
+
+        response = self.client.patch(
+            f"/api/tasks/0/{self.tasks_count}", files=files, headers=self.headers
+        )
+        root = dirname(dirname(abspath(__file__)))
+        with open(join(root, 'materials', '0_test', 'code', f'task_{self.tasks_count}.txt'),
+                  mode='rb') as f:
+            saved_code = f.read()
+
+        assert response.status_code == 200
+        assert response.json().get("id") == self.tasks_count
+        assert saved_code == code
+
     def test_task_delete(self):
         response = self.client.delete(
             f"/api/tasks/0/{self.tasks_count}", params={"test": True}, headers=self.headers
@@ -99,6 +117,19 @@ class TestTasksErrorsSync(TestAuthMixin):
         assert response_not_found_task.json()["detail"] == "Task not found by ID"
         assert response_not_found_topic.json()["detail"] == "Topic not found by ID"
 
+    def test_task_update_code_only_not_found(self):
+        files = {"task": (None, b'{"title": "", "description": [], '
+                                b'"input": [], "output": []}'),
+                 "code": ("code.py", b'print("CODE")\n')}
+        response_not_found_task = self.client.patch(
+            f"/api/tasks/0/9999", files=files, headers=self.headers
+        )
+        root = dirname(dirname(abspath(__file__)))
+
+        assert response_not_found_task.status_code == 404
+        assert response_not_found_task.json()["detail"] == "Task not found by ID"
+        assert not exists(join(root, 'materials', '0_test', 'code', 'task_9999.txt'))
+
     def test_task_delete_not_found(self):
         response_not_found_task = self.client.delete(
             f"/api/tasks/0/999", params={"test": True}, headers=self.headers
@@ -121,3 +152,14 @@ class TestTasksErrorsSync(TestAuthMixin):
 
         assert response_not_found_task.status_code == 422
         assert response_not_found_task.json()["detail"] == "The request was empty"
+
+    def test_task_update_empty_code_file(self):
+        files = {"task": (None, b'{"title": "", "description": [], '
+                                b'"input": [], "output": []}'),
+                 "code": ("code.py", b'')}
+        response = self.client.patch(
+            f"/api/tasks/0/1", files=files, headers=self.headers
+        )
+
+        assert response.status_code == 422
+        assert response.json()["detail"] == "The request was empty"
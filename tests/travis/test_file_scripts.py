@@ -0,0 +1,110 @@
+from asyncio import gather, sleep
+from json import loads, dumps
+from os import mkdir
+from os.path import abspath, dirname, join
+from shutil import copy
+from pytest import fixture, mark
+from utilities.file_scripts import FileUtils
+
+
+@fixture
+def topic_index(tmp_path, monkeypatch):
+    """Runs a test against a copy of the topic index, with a fresh `FileUtils` state."""
+    root = dirname(dirname(dirname(abspath(__file__))))
+    mkdir(tmp_path / 'materials')
+    copy(join(root, 'materials', 'topics.json'), tmp_path / 'materials' / 'topics.json')
+    monkeypatch.chdir(tmp_path)
+    FileUtils._resolve_path.cache_clear()
+    for name, value in {
+        "_topic_index_cache": None, "_topic_index_version": 0, "_topic_index_saved_version": 0,
+        "_topic_index_dirty": None, "_topic_index_persister": None, "_topic_locks": {},
+    }.items():
+        monkeypatch.setattr(FileUtils, name, value)
+    yield tmp_path / 'materials' / 'topics.json'
+    FileUtils._resolve_path.cache_clear()
+
+
+def read_count(path) -> int:
+    with open(path, mode='r', encoding='utf-8') as f:
+        return loads(f.read())[0]["count"]
+
+
+class TestTopicIndexPersister:
+    @mark.asyncio
+    async def test_writes_coalesced(self, topic_index, monkeypatch):
+        writes = []
+        write_topic_index = FileUtils._write_topic_index.__func__
+
+        async def counted_write(cls):
+            writes.append(cls._topic_index_version)
+            await write_topic_index(cls)
+
+        monkeypatch.setattr(FileUtils, "_write_topic_index", classmethod(counted_write))
+        count = read_count(topic_index)
+        FileUtils.start_topic_index_persister()
+
+        await gather(*[FileUtils.update_topic_count(0, 1) for _ in range(10)])
+        unsaved_count = read_count(topic_index)
+        await sleep(FileUtils.TOPIC_INDEX_FLUSH_DELAY * 3)
+        await FileUtils.stop_topic_index_persister()
+
+        assert unsaved_count == count
+        assert len(writes) == 1
+        assert read_count(topic_index) == count + 10
+
+    @mark.asyncio
+    async def test_shutdown_flush(self, topic_index, monkeypatch):
+        monkeypatch.setattr(FileUtils, "TOPIC_INDEX_FLUSH_DELAY", 60.0)
+        count = read_count(topic_index)
+        FileUtils.start_topic_index_persister()
+
+        await FileUtils.update_topic_count(0, 1)
+        await FileUtils.stop_topic_index_persister()
+
+        assert read_count(topic_index) == count + 1
+
+    @mark.asyncio
+    async def test_no_stale_reload(self, topic_index, monkeypatch):
+        write_topic_index = FileUtils._write_topic_index.__func__
+
+        async def slow_write(cls):
+            await sleep(0.05)
+            await write_topic_index(cls)
+
+        monkeypatch.setattr(FileUtils, "_write_topic_index", classmethod(slow_write))
+        monkeypatch.setattr(FileUtils, "TOPIC_INDEX_TTL", 0.0)
+        monkeypatch.setattr(FileUtils, "TOPIC_INDEX_FLUSH_DELAY", 0.0)
+        FileUtils.start_topic_index_persister()
+
+        async with FileUtils.reserve_task_id(0) as first_id:
+            pass
+        # The persister is writing the first change to disk now
+        await sleep(0.01)
+        async with FileUtils.reserve_task_id(0) as second_id:
+            pass
+        await FileUtils.stop_topic_index_persister()
+
+        assert second_id == first_id + 1
+        assert read_count(topic_index) == second_id
+
+    @mark.asyncio
+    async def test_outside_edit_reloaded(self, topic_index, monkeypatch):
+        monkeypatch.setattr(FileUtils, "TOPIC_INDEX_TTL", 0.0)
+        FileUtils.start_topic_index_persister()
+
+        await FileUtils.update_topic_count(0, 1)
+        await sleep(FileUtils.TOPIC_INDEX_FLUSH_DELAY * 3)
+        with open(topic_index, mode='r', encoding='utf-8') as f:
+            topics = loads(f.read())
+        topics.append({"id": 1, "name": "New", "path": "1_new", "count": 0})
+        with open(topic_index, mode='w', encoding='utf-8') as f:
+            f.write(dumps(topics))
+        reloaded = await FileUtils.open_file('topic_index')
+        await FileUtils.update_topic_count(0, 1)
+        await FileUtils.stop_topic_index_persister()
+
+        with open(topic_index, mode='r', encoding='utf-8') as f:
+            saved = loads(f.read())
+        assert len(reloaded) == 2
+        assert len(saved) == 2
+        assert saved[0]["count"] == topics[0]["count"] + 1
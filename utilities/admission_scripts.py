@@ -0,0 +1,83 @@
+"""
+`admission_scripts` module stores the adaptive admission control for heavy endpoints.
+"""
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import AsyncIterator
+from fastapi import HTTPException
+from schemas.errors import ServerOverloaded
+
+
+class AdmissionController:
+    """
+    `AdmissionController` class limits the number of requests handled concurrently.
+    The limit follows the AIMD rule: it grows by `alpha` while the average latency
+    stays within `target_latency` seconds and is multiplied by `beta` on overload.
+    A single overload decreases the limit once: after a decrease, the next one
+    is possible only after `window` completed requests.
+    Requests over the limit are rejected with the 503 status code.
+    """
+
+    def __init__(
+            self, target_latency: float = 0.1, alpha: float = 0.5, beta: float = 0.5,
+            min_limit: float = 1.0, max_limit: float = 64.0, smoothing: float = 0.2,
+            window: int = 10
+    ) -> None:
+        self.target_latency = target_latency
+        self.alpha = alpha
+        self.beta = beta
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.smoothing = smoothing
+        self.window = window
+        self.limit = max_limit / 2
+        self.latency = 0.0
+        self.in_flight = 0
+        self._since_decrease = window
+
+    def on_success(self, latency: float) -> None:
+        """
+        `AdmissionController.on_success` public method updates the average latency
+        and adjusts the limit to it. It takes one parameter: latency, in seconds.
+        """
+        self._since_decrease += 1
+        self.latency += self.smoothing * (latency - self.latency)
+        if self.latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + self.alpha)
+        else:
+            self.on_error()
+
+    def on_error(self) -> None:
+        """
+        `AdmissionController.on_error` public method decreases the limit multiplicatively,
+        at most once per `window` completed requests.
+        """
+        if self._since_decrease < self.window:
+            return
+        self._since_decrease = 0
+        self.limit = max(self.min_limit, self.limit * self.beta)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        `AdmissionController.slot` public method admits a request into the context block.
+        It raises the 503 HTTP exception if there are no free slots left.
+        Server errors raised inside the block are counted as an overload.
+        """
+        if self.in_flight >= int(self.limit):
+            raise HTTPException(status_code=503, detail=ServerOverloaded().error)
+        self.in_flight += 1
+        started = perf_counter()
+        try:
+            yield
+        except HTTPException as e:
+            if e.status_code >= 500:
+                self.on_error()
+            raise
+        except Exception:
+            self.on_error()
+            raise
+        else:
+            self.on_success(perf_counter() - started)
+        finally:
+            self.in_flight -= 1
@@ -2,16 +2,36 @@
 `file_scripts` module stores tasks I/O utilities.
 """
 import aiofiles
+from asyncio import Event, Lock, Task, CancelledError, ensure_future, sleep
 from aiofiles.os import remove, mkdir
+from os import remove as remove_sync
 from os.path import abspath, join, normpath, isfile
-from json import loads, dumps
-from typing import List, Iterable
+from starlette.concurrency import run_in_threadpool
+from orjson import loads, dumps
+from contextlib import asynccontextmanager
+from copy import deepcopy
+from functools import lru_cache
+from time import monotonic
+from typing import List, Dict, Iterable, AsyncIterable, AsyncIterator, Optional, Tuple
 
 
 class FileUtils:
     """
     `FileUtils` class stores utilities for saving user input files and file paths.
+    Class attribute `CHUNK_SIZE` stores the size of a single uploaded file chunk.
+    Class attribute `TOPIC_INDEX_TTL` stores the lifetime of the cached topic index in seconds,
+    it does not apply while the cached topic index has unsaved changes.
+    Class attribute `TOPIC_INDEX_FLUSH_DELAY` stores the topic index write coalescing delay.
     """
+    CHUNK_SIZE = 65536
+    TOPIC_INDEX_TTL = 5.0
+    TOPIC_INDEX_FLUSH_DELAY = 0.1
+    _topic_index_cache: Optional[Tuple[float, list]] = None
+    _topic_index_version = 0
+    _topic_index_saved_version = 0
+    _topic_index_dirty: Optional[Event] = None
+    _topic_index_persister: Optional[Task] = None
+    _topic_locks: Dict[int, Lock] = {}
 
     @classmethod
     async def _get_filepath(
@@ -26,34 +46,128 @@ class FileUtils:
         """
         topic_path = None
         if topic_id is not None:
-            topic_index = await cls.open_file('topic_index')
+            topic_index = await cls._read_topic_index()
             topic_path = topic_index[topic_id].get("path")
 
+        return cls._resolve_path(title, topic_path, task_id)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _resolve_path(title: str, topic_path: str = None, task_id: int = None) -> str:
+        """
+        `FileUtils._resolve_path` private static method builds the path to a file by path name.
+        The result is memoized, since the same files are accessed several times per request.
+        It takes three parameters:
+        1. `title` has five variants: task_info, task_input, task_output, task_code, topic_index.
+        2. `topic_path` means the topic directory name.
+        3. `task_id` means an id of the task in a topic and a part of the file name.
+        """
+        if title == "topic_index":
+            return normpath(abspath(join('materials', 'topics.json')))
         filesystem = {
-            "task_info": normpath(abspath(
-                join('materials', f'{topic_path}', 'description', f'task_{task_id}.json')
-            )),
+            "task_info": ('description', 'json'),
+            "task_input": ('input', 'txt'),
+            "task_output": ('output', 'txt'),
+            "task_code": ('code', 'txt'),
+        }
+        try:
+            directory, extension = filesystem[title]
+        except KeyError as e:
+            raise ValueError(f'No such get_filepath() mode like "{title}"') from e
+        return normpath(abspath(
+            join('materials', f'{topic_path}', directory, f'task_{task_id}.{extension}')
+        ))
 
-            "task_input": normpath(abspath(
-                join('materials', f'{topic_path}', 'input', f'task_{task_id}.txt')
-            )),
+    @classmethod
+    async def _read_topic_index(cls: 'FileUtils') -> list:
+        """
+        `FileUtils._read_topic_index` private class method returns the cached topic index.
+        The index is read from disk again once the cache is older than `TOPIC_INDEX_TTL`,
+        unless the cache has changes that are not saved yet.
+        The returned list is shared between callers, so it must not be mutated.
+        """
+        cache = cls._topic_index_cache
+        unsaved = cls._topic_index_version != cls._topic_index_saved_version
+        if cache is not None and (unsaved or monotonic() - cache[0] < cls.TOPIC_INDEX_TTL):
+            return cache[1]
+        path = await cls._get_filepath('topic_index')
+        async with aiofiles.open(path, mode='rb') as f:
+            topic_index = loads(await f.read())
+        if cls._topic_index_cache is not cache:
+            # The index was refreshed or changed while this read was pending
+            return cls._topic_index_cache[1]
+        cls._topic_index_cache = (monotonic(), topic_index)
+        return topic_index
 
-            "task_output": normpath(abspath(
-                join('materials', f'{topic_path}', 'output', f'task_{task_id}.txt')
-            )),
+    @classmethod
+    async def _write_topic_index(cls: 'FileUtils') -> None:
+        """
+        `FileUtils._write_topic_index` private class method writes the cached topic index to disk.
+        Changes made while the file is written stay unsaved.
+        """
+        version = cls._topic_index_version
+        content = dumps(cls._topic_index_cache[1])
+        path = await cls._get_filepath('topic_index')
+        async with aiofiles.open(path, mode='wb') as f:
+            await f.write(content)
+        cls._topic_index_saved_version = max(cls._topic_index_saved_version, version)
 
-            "task_code": normpath(abspath(
-                join('materials', f'{topic_path}', 'code', f'task_{task_id}.txt')
-            )),
+    @classmethod
+    async def _topic_index_changed(cls: 'FileUtils') -> None:
+        """
+        `FileUtils._topic_index_changed` private class method marks the cached topic index
+        as changed, and writes it to disk if the topic index persister is not running.
+        """
+        cls._topic_index_version += 1
+        cls._topic_index_cache = (monotonic(), cls._topic_index_cache[1])
+        if cls._topic_index_persister is not None:
+            cls._topic_index_dirty.set()
+        else:
+            await cls._write_topic_index()
 
-            "topic_index": normpath(abspath(
-                join('materials', f'topics.json')
-            ))
-        }
+    @classmethod
+    async def _persist_topic_index(cls: 'FileUtils') -> None:
+        """
+        `FileUtils._persist_topic_index` private class method writes the cached topic index
+        to disk once it is changed, coalescing changes made within `TOPIC_INDEX_FLUSH_DELAY`.
+        """
+        while True:
+            await cls._topic_index_dirty.wait()
+            await sleep(cls.TOPIC_INDEX_FLUSH_DELAY)
+            cls._topic_index_dirty.clear()
+            try:
+                await cls._write_topic_index()
+            except OSError as e:
+                print("Failed to save the topic index.", e)
+            if cls._topic_index_version != cls._topic_index_saved_version:
+                cls._topic_index_dirty.set()
+
+    @classmethod
+    def start_topic_index_persister(cls: 'FileUtils') -> None:
+        """
+        `FileUtils.start_topic_index_persister` public class method starts
+        the background task saving topic index changes, e.g. on the app startup.
+        Until it is started, every change is written to disk immediately.
+        """
+        cls._topic_index_dirty = Event()
+        cls._topic_index_persister = ensure_future(cls._persist_topic_index())
+
+    @classmethod
+    async def stop_topic_index_persister(cls: 'FileUtils') -> None:
+        """
+        `FileUtils.stop_topic_index_persister` public class method stops
+        the background task saving topic index changes and saves the pending ones.
+        """
+        if cls._topic_index_persister is None:
+            return
+        cls._topic_index_persister.cancel()
         try:
-            return filesystem[title]
-        except KeyError as e:
-            raise ValueError(f'No such get_filepath() mode like "{title}"') from e
+            await cls._topic_index_persister
+        except CancelledError:
+            pass
+        cls._topic_index_dirty = cls._topic_index_persister = None
+        if cls._topic_index_version != cls._topic_index_saved_version:
+            await cls._write_topic_index()
 
     @staticmethod
     async def _write_user_answer_temp(code: bytes) -> str:
@@ -83,13 +197,15 @@ class FileUtils:
         """
         path = await cls._get_filepath(title, topic_id, task_id)
         try:
-            async with aiofiles.open(path, encoding='utf-8', mode='r') as f:
+            if title == 'topic_index':
+                return deepcopy(await cls._read_topic_index())
+            async with aiofiles.open(path, mode='rb', buffering=cls.CHUNK_SIZE) as f:
+                # Bytes are parsed as is, without a decode/encode round-trip
                 content = await f.read()
-                content = content.encode('utf-8')
                 if '.json' in f.name:
                     return loads(content)
                 elif '.txt' in f.name:
-                    return content
+                    return content.replace(b'\r\n', b'\n')
                 else:
                     raise ValueError('Wrong file extension.')
         except FileNotFoundError as e:
@@ -100,27 +216,46 @@ class FileUtils:
     @classmethod
     async def open_file_values(
             cls: 'FileUtils', title: str, topic_id: int = None, task_id: int = None
-    ) -> List[bytes]:
+    ) -> List[str]:
         """
         `FileUtils.open_file_values` public class method accesses
         task input and task output values.
-        It returns the content of the file read, separated by a newline.
+        It returns the decoded content of the file read, separated by a newline.
         It takes three parameters (excluding cls):
         1. `title` has 2 variants - task_input, task_output.
         2. `topic_id` means an id of the topic and the directory name.
         3. `task_id` means an id of the task in a topic and a part of the file name.
         """
         path = await cls._get_filepath(title, topic_id, task_id)
-        async with aiofiles.open(path, encoding='utf-8', mode='r') as f:
+        async with aiofiles.open(path, mode='rb', buffering=cls.CHUNK_SIZE) as f:
             if f.name.endswith('.txt'):
                 content = await f.read()
-                return content.encode('utf-8').split(b'\n')
+                return content.decode('utf-8').replace('\r\n', '\n').split('\n')
             else:
                 raise ValueError('Wrong file extension.')
 
+    @classmethod
+    async def iter_upload(
+            cls: 'FileUtils', upload, first_chunk: bytes = b''
+    ) -> AsyncIterator[bytes]:
+        """
+        `FileUtils.iter_upload` public class method yields
+        an uploaded file chunk by chunk, without buffering it in memory.
+        It takes two parameters (excluding cls):
+        1. `upload` is an uploaded file, e.g. the FastAPI `UploadFile`.
+        2. `first_chunk` is an already read chunk that will be yielded first.
+        """
+        if first_chunk:
+            yield first_chunk
+        while True:
+            chunk = await upload.read(cls.CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
     @classmethod
     async def save_file(
-            cls: 'FileUtils', title: str, content: bytes or dict,
+            cls: 'FileUtils', title: str, content: bytes or dict or AsyncIterable[bytes],
             topic_id: int = None, task_id: int = None
     ) -> None:
         """
@@ -128,17 +263,27 @@ class FileUtils:
         topic index, task description or task code to file.
         It takes four parameters (excluding cls):
         1. `title` has 3 variants - topic_index, task_info, task_code.
-        2. `content` is the text that will be written to a file.
+        2. `content` is the text that will be written to a file,
+           task code can also be an async iterable of bytes chunks.
         3. `topic_id` means an id of the topic and the directory name.
         4. `task_id` means an id of the task in a topic and a part of the file name.
         """
         path = await cls._get_filepath(title, topic_id, task_id)
-        async with aiofiles.open(path, encoding='utf-8', mode='w') as f:
+        if hasattr(content, '__aiter__'):
+            if not path.endswith('.txt'):
+                raise ValueError('Wrong file extension.')
+            async with aiofiles.open(path, mode='wb') as f:
+                async for chunk in content:
+                    await f.write(chunk)
+            return
+        if title == 'topic_index':
+            # Write through the cache, so the next reads skip the disk
+            cls._topic_index_cache = (monotonic(), deepcopy(content))
+            return await cls._topic_index_changed()
+        async with aiofiles.open(path, mode='wb') as f:
             if f.name.endswith('.json'):
-                content = dumps(content, ensure_ascii=False)
-            elif f.name.endswith('.txt'):
-                content = content.decode('utf-8')
-            else:
+                content = dumps(content)
+            elif not f.name.endswith('.txt'):
                 raise ValueError('Wrong file extension.')
             await f.write(content)
 
@@ -161,8 +306,53 @@ class FileUtils:
             if not f.name.endswith('.txt'):
                 raise ValueError('Wrong file extension.')
             else:
-                for value in content:
-                    await f.writelines(f'{value}\n')
+                # A single write makes one thread pool hop instead of one per value
+                await f.write(''.join(f'{value}\n' for value in content))
+
+    @classmethod
+    async def update_topic_count(
+            cls: 'FileUtils', topic_id: int, delta: int
+    ) -> int:
+        """
+        `FileUtils.update_topic_count` public class method changes the tasks count
+        of a topic in place in the cached topic index and schedules the index saving.
+        It returns the new tasks count.
+        It takes two parameters (excluding cls):
+        1. `topic_id` means an id of the topic.
+        2. `delta` is the number added to the tasks count.
+        """
+        topic = (await cls._read_topic_index())[topic_id]
+        topic["count"] += delta
+        count = topic["count"]
+        await cls._topic_index_changed()
+        return count
+
+    @classmethod
+    @asynccontextmanager
+    async def reserve_task_id(cls: 'FileUtils', topic_id: int) -> AsyncIterator[int]:
+        """
+        `FileUtils.reserve_task_id` public class method yields an ID for a new task.
+        The topic tasks count is bumped only once the context block succeeds,
+        so readers never see a task whose files are not written yet.
+        If the block fails, the task files written so far are removed.
+        Task creations in one topic run one at a time.
+        It takes one parameter (excluding cls): `topic_id` means an id of the topic.
+        """
+        # Raises IndexError before a lock is kept for a nonexistent topic
+        (await cls._read_topic_index())[topic_id]
+        if topic_id not in cls._topic_locks:
+            cls._topic_locks[topic_id] = Lock()
+        async with cls._topic_locks[topic_id]:
+            task_id = (await cls._read_topic_index())[topic_id]["count"] + 1
+            try:
+                yield task_id
+            except BaseException:
+                try:
+                    await cls.remove_task_files(topic_id, task_id)
+                except FileNotFoundError:
+                    pass
+                raise
+            await cls.update_topic_count(topic_id, 1)
 
     @classmethod
     async def remove_file(
@@ -182,6 +372,41 @@ class FileUtils:
         except OSError as e:
             raise FileNotFoundError(f'File path can not be removed: {path}') from e
 
+    @staticmethod
+    def _remove_paths(paths: Iterable[str]) -> List[str]:
+        """
+        `FileUtils._remove_paths` private static method removes files synchronously.
+        It returns the paths that could not be removed.
+        It takes one parameter: paths, the file paths to remove.
+        """
+        failed = []
+        for path in paths:
+            try:
+                remove_sync(path)
+            except OSError:
+                failed.append(path)
+        return failed
+
+    @classmethod
+    async def remove_task_files(
+            cls: 'FileUtils', topic_id: int, task_id: int
+    ) -> None:
+        """
+        `FileUtils.remove_task_files` public class method removes
+        the description, input, output and code files of a task
+        in a single thread pool call.
+        It takes two parameters (excluding cls):
+        1. `topic_id` means an id of the topic and the directory name.
+        2. `task_id` means an id of the task in a topic and a part of the file name.
+        """
+        paths = [
+            await cls._get_filepath(title, topic_id, task_id)
+            for title in ("task_info", "task_input", "task_output", "task_code")
+        ]
+        failed = await run_in_threadpool(cls._remove_paths, paths)
+        if failed:
+            raise FileNotFoundError(f'File paths can not be removed: {", ".join(failed)}')
+
     @classmethod
     async def get_user_answer_temp(
             cls: 'FileUtils', code: bytes,